@@ -1,8 +1,31 @@
 """Shared test fixtures and utilities for modal-infra tests."""
 
+from collections.abc import Iterator
 from typing import Any
 
 import httpx
+import pytest
+
+SUPERVISOR_ENV = {
+    "SANDBOX_ID": "test-sandbox",
+    "CONTROL_PLANE_URL": "https://cp.example.com",
+    "SANDBOX_AUTH_TOKEN": "tok",
+    "REPO_OWNER": "acme",
+    "REPO_NAME": "app",
+}
+
+
+@pytest.fixture(scope="module")
+def supervisor_env() -> Iterator[None]:
+    """Set the env vars SandboxSupervisor reads in __init__, once per module.
+
+    Opt in via ``pytest.mark.usefixtures("supervisor_env")`` or a fixture dependency;
+    values are restored at module teardown so they never leak into other modules.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in SUPERVISOR_ENV.items():
+            mp.setenv(key, value)
+        yield
 
 
 class MockResponse:
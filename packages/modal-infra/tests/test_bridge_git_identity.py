@@ -9,9 +9,7 @@ from src.sandbox.bridge import FALLBACK_GIT_USER, AgentBridge
 from src.sandbox.types import GitUser
 
 
-@pytest.fixture
-def bridge() -> AgentBridge:
-    """Create a bridge instance for testing."""
+def _make_bridge() -> AgentBridge:
     b = AgentBridge(
         sandbox_id="test-sandbox",
         session_id="test-session",
@@ -22,149 +20,94 @@ def bridge() -> AgentBridge:
     return b
 
 
-class TestGitIdentityConfiguration:
-    """Tests for git identity fallback in _handle_prompt."""
-
-    @pytest.mark.asyncio
-    async def test_uses_author_identity_when_provided(self, bridge: AgentBridge):
-        """Should use scmName/scmEmail from the prompt author when both are present."""
-        bridge._configure_git_identity = AsyncMock()
-        bridge._stream_opencode_response_sse = AsyncMock(
-            return_value=AsyncMock(
-                __aiter__=lambda s: s, __anext__=AsyncMock(side_effect=StopAsyncIteration)
-            )
-        )
-        bridge._send_execution_complete = AsyncMock()
-
-        cmd = {
-            "messageId": "msg-1",
-            "content": "fix the bug",
-            "model": "claude-sonnet-4-6",
-            "author": {
-                "userId": "user-1",
-                "scmName": "Jane Dev",
-                "scmEmail": "jane@example.com",
-            },
-        }
-
-        await bridge._handle_prompt(cmd)
-
-        bridge._configure_git_identity.assert_called_once()
-        git_user = bridge._configure_git_identity.call_args[0][0]
-        assert git_user.name == "Jane Dev"
-        assert git_user.email == "jane@example.com"
-
-    @pytest.mark.asyncio
-    async def test_falls_back_when_both_missing(self, bridge: AgentBridge):
-        """Should use fallback identity when both scmName and scmEmail are null."""
-        bridge._configure_git_identity = AsyncMock()
-        bridge._stream_opencode_response_sse = AsyncMock(
-            return_value=AsyncMock(
-                __aiter__=lambda s: s, __anext__=AsyncMock(side_effect=StopAsyncIteration)
-            )
-        )
-        bridge._send_execution_complete = AsyncMock()
-
-        cmd = {
-            "messageId": "msg-1",
-            "content": "fix the bug",
-            "model": "claude-sonnet-4-6",
-            "author": {
-                "userId": "user-1",
-                "scmName": None,
-                "scmEmail": None,
-            },
-        }
-
-        await bridge._handle_prompt(cmd)
-
-        bridge._configure_git_identity.assert_called_once()
-        git_user = bridge._configure_git_identity.call_args[0][0]
-        assert git_user.name == FALLBACK_GIT_USER.name
-        assert git_user.email == FALLBACK_GIT_USER.email
-
-    @pytest.mark.asyncio
-    async def test_falls_back_email_when_only_email_missing(self, bridge: AgentBridge):
-        """Should use fallback email when scmEmail is null but scmName is present."""
-        bridge._configure_git_identity = AsyncMock()
-        bridge._stream_opencode_response_sse = AsyncMock(
-            return_value=AsyncMock(
-                __aiter__=lambda s: s, __anext__=AsyncMock(side_effect=StopAsyncIteration)
-            )
-        )
-        bridge._send_execution_complete = AsyncMock()
-
-        cmd = {
-            "messageId": "msg-1",
-            "content": "fix the bug",
-            "model": "claude-sonnet-4-6",
-            "author": {
-                "userId": "user-1",
-                "scmName": "Jane Dev",
-                "scmEmail": None,
-            },
-        }
+@pytest.fixture
+def bridge() -> AgentBridge:
+    """Create a bridge instance for testing."""
+    return _make_bridge()
+
+
+@pytest.fixture(scope="class")
+def prompt_bridge() -> AgentBridge:
+    """Bridge with git identity and OpenCode streaming stubbed for _handle_prompt.
+
+    Shared across a class; pair with _reset_prompt_bridge to isolate tests.
+    """
+    b = _make_bridge()
+    b._configure_git_identity = AsyncMock()
+    # _stream_opencode_response_sse is an async generator: calling it returns the
+    # iterable directly, so the stub must be a plain MagicMock rather than AsyncMock.
+    stream = MagicMock()
+    stream.__aiter__.return_value = []
+    b._stream_opencode_response_sse = MagicMock(return_value=stream)
+    return b
 
-        await bridge._handle_prompt(cmd)
-
-        bridge._configure_git_identity.assert_called_once()
-        git_user = bridge._configure_git_identity.call_args[0][0]
-        assert git_user.name == "Jane Dev"
-        assert git_user.email == FALLBACK_GIT_USER.email
-
-    @pytest.mark.asyncio
-    async def test_falls_back_name_when_only_name_missing(self, bridge: AgentBridge):
-        """Should use fallback name when scmName is null but scmEmail is present."""
-        bridge._configure_git_identity = AsyncMock()
-        bridge._stream_opencode_response_sse = AsyncMock(
-            return_value=AsyncMock(
-                __aiter__=lambda s: s, __anext__=AsyncMock(side_effect=StopAsyncIteration)
-            )
-        )
-        bridge._send_execution_complete = AsyncMock()
 
-        cmd = {
-            "messageId": "msg-1",
-            "content": "fix the bug",
-            "model": "claude-sonnet-4-6",
-            "author": {
-                "userId": "user-1",
-                "scmName": None,
-                "scmEmail": "jane@example.com",
-            },
-        }
-
-        await bridge._handle_prompt(cmd)
-
-        bridge._configure_git_identity.assert_called_once()
-        git_user = bridge._configure_git_identity.call_args[0][0]
-        assert git_user.name == FALLBACK_GIT_USER.name
-        assert git_user.email == "jane@example.com"
-
-    @pytest.mark.asyncio
-    async def test_falls_back_when_no_author_data(self, bridge: AgentBridge):
-        """Should use fallback identity when author dict has no SCM fields."""
-        bridge._configure_git_identity = AsyncMock()
-        bridge._stream_opencode_response_sse = AsyncMock(
-            return_value=AsyncMock(
-                __aiter__=lambda s: s, __anext__=AsyncMock(side_effect=StopAsyncIteration)
-            )
-        )
-        bridge._send_execution_complete = AsyncMock()
+class TestGitIdentityConfiguration:
+    """Tests for git identity fallback in _handle_prompt."""
 
+    @pytest.fixture(autouse=True)
+    def _reset_prompt_bridge(self, prompt_bridge: AgentBridge) -> None:
+        """Clear per-prompt state left on the class-scoped bridge by earlier cases."""
+        prompt_bridge._configure_git_identity.reset_mock()
+        prompt_bridge._event_buffer.clear()
+        prompt_bridge.opencode_session_id = "oc-session-123"
+
+    @pytest.mark.parametrize(
+        ("author", "expected_name", "expected_email"),
+        [
+            pytest.param(
+                {"userId": "user-1", "scmName": "Jane Dev", "scmEmail": "jane@example.com"},
+                "Jane Dev",
+                "jane@example.com",
+                id="uses_author_identity_when_provided",
+            ),
+            pytest.param(
+                {"userId": "user-1", "scmName": None, "scmEmail": None},
+                FALLBACK_GIT_USER.name,
+                FALLBACK_GIT_USER.email,
+                id="falls_back_when_both_missing",
+            ),
+            pytest.param(
+                {"userId": "user-1", "scmName": "Jane Dev", "scmEmail": None},
+                "Jane Dev",
+                FALLBACK_GIT_USER.email,
+                id="falls_back_email_when_only_email_missing",
+            ),
+            pytest.param(
+                {"userId": "user-1", "scmName": None, "scmEmail": "jane@example.com"},
+                FALLBACK_GIT_USER.name,
+                "jane@example.com",
+                id="falls_back_name_when_only_name_missing",
+            ),
+            pytest.param(
+                {"userId": "user-1"},
+                FALLBACK_GIT_USER.name,
+                FALLBACK_GIT_USER.email,
+                id="falls_back_when_no_author_data",
+            ),
+        ],
+    )
+    async def test_git_identity(
+        self,
+        prompt_bridge: AgentBridge,
+        author: dict,
+        expected_name: str,
+        expected_email: str,
+    ):
+        """Should use the author's SCM identity, falling back per missing field."""
         cmd = {
             "messageId": "msg-1",
             "content": "fix the bug",
             "model": "claude-sonnet-4-6",
-            "author": {"userId": "user-1"},
+            "author": author,
         }
 
-        await bridge._handle_prompt(cmd)
+        await prompt_bridge._handle_prompt(cmd)
 
-        bridge._configure_git_identity.assert_called_once()
-        git_user = bridge._configure_git_identity.call_args[0][0]
-        assert git_user.name == FALLBACK_GIT_USER.name
-        assert git_user.email == FALLBACK_GIT_USER.email
+        prompt_bridge._configure_git_identity.assert_called_once()
+        git_user = prompt_bridge._configure_git_identity.call_args[0][0]
+        assert git_user.name == expected_name
+        assert git_user.email == expected_email
 
 
 class TestFallbackGitUserConstant:
@@ -179,7 +122,6 @@ class TestFallbackGitUserConstant:
 class TestConfigureGitIdentity:
     """Tests for non-blocking git identity configuration."""
 
-    @pytest.mark.asyncio
     async def test_configures_name_and_email_with_async_subprocess(
         self,
         bridge: AgentBridge,
@@ -229,7 +171,6 @@ class TestConfigureGitIdentity:
             ]
         )
 
-    @pytest.mark.asyncio
     async def test_logs_error_when_git_config_fails(
         self,
         bridge: AgentBridge,
@@ -255,7 +196,6 @@ class TestConfigureGitIdentity:
         bridge.log.error.assert_called_once()
         assert bridge.log.error.call_args.args[0] == "git.identity_error"
 
-    @pytest.mark.asyncio
     async def test_logs_error_when_git_config_times_out(
         self,
         bridge: AgentBridge,
@@ -1,24 +1,34 @@
 """Tests for bridge git push handling."""
 
 import asyncio
+from collections.abc import Callable
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from src.sandbox.bridge import AgentBridge
 
+REPO_DIR = Path("/workspace/repo")
 
-def _create_bridge(tmp_path: Path) -> AgentBridge:
+
+def _glob_repo(pattern: str) -> list[Path]:
+    """Stand-in for Path.glob that only answers _handle_push's clone lookup."""
+    assert pattern == "*/.git"
+    return [REPO_DIR / ".git"]
+
+
+def _create_bridge() -> AgentBridge:
     bridge = AgentBridge(
         sandbox_id="test-sandbox",
         session_id="test-session",
         control_plane_url="http://localhost:8787",
         auth_token="test-token",
     )
-    bridge.repo_path = tmp_path
-    repo_dir = tmp_path / "repo"
-    (repo_dir / ".git").mkdir(parents=True)
+    # _handle_push only locates the clone via repo_path.glob("*/.git") and hands the
+    # result to the (faked) subprocess as cwd, so report one without touching disk.
+    bridge.repo_path = SimpleNamespace(glob=_glob_repo)
     return bridge
 
 
@@ -35,27 +45,73 @@ def _push_command() -> dict:
     }
 
 
-def _fake_process(returncode: int | None, communicate_result: tuple[bytes, bytes] = (b"", b"")):
-    process = MagicMock()
-    process.returncode = returncode
-    process.communicate = AsyncMock(return_value=communicate_result)
-    process.wait = AsyncMock(return_value=None)
-    process.terminate = MagicMock()
-    process.kill = MagicMock()
-    return process
+def _fake_process(
+    returncode: int | None, communicate_result: tuple[bytes, bytes] = (b"", b"")
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        returncode=returncode,
+        communicate=AsyncMock(return_value=communicate_result),
+        wait=AsyncMock(return_value=None),
+        terminate=MagicMock(),
+        kill=MagicMock(),
+    )
+
+
+@pytest.fixture
+def fake_subprocess(monkeypatch: pytest.MonkeyPatch) -> Callable[[SimpleNamespace], None]:
+    """Route create_subprocess_exec to a fake process; call the result to set it.
+
+    The keyword arguments of the spawn are recorded on the process as exec_kwargs.
+    """
+    holder: dict[str, SimpleNamespace] = {}
+
+    async def _create_subprocess_exec(*args, **kwargs) -> SimpleNamespace:
+        process = holder["process"]
+        process.exec_kwargs = kwargs
+        return process
+
+    def _set(process: SimpleNamespace) -> None:
+        holder["process"] = process
+
+    monkeypatch.setattr(
+        "src.sandbox.bridge.asyncio.create_subprocess_exec", _create_subprocess_exec
+    )
+    return _set
+
+
+# Bound before any test patches asyncio.wait_for, so _TimeoutFirst can delegate to it.
+_ORIGINAL_WAIT_FOR = asyncio.wait_for
+
 
+class _TimeoutFirst:
+    """asyncio.wait_for stand-in that times out on the first call only.
 
-@pytest.mark.asyncio
-async def test_handle_push_sends_push_complete_on_success(tmp_path: Path):
-    bridge = _create_bridge(tmp_path)
+    Records each call's timeout and delegates later calls to the real wait_for.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[float | None] = []
+
+    async def __call__(self, coro, timeout=None):
+        self.calls.append(timeout)
+        if len(self.calls) == 1:
+            if hasattr(coro, "close"):
+                coro.close()
+            raise TimeoutError
+        return await _ORIGINAL_WAIT_FOR(coro, timeout=timeout)
+
+
+async def test_handle_push_sends_push_complete_on_success(
+    fake_subprocess: Callable[[SimpleNamespace], None],
+):
+    bridge = _create_bridge()
     bridge._send_event = AsyncMock()
     process = _fake_process(returncode=0)
+    fake_subprocess(process)
 
-    with patch(
-        "src.sandbox.bridge.asyncio.create_subprocess_exec", AsyncMock(return_value=process)
-    ):
-        await bridge._handle_push(_push_command())
+    await bridge._handle_push(_push_command())
 
+    assert process.exec_kwargs["cwd"] == REPO_DIR
     bridge._send_event.assert_awaited_once()
     await_args = bridge._send_event.await_args
     assert await_args is not None
@@ -67,17 +123,17 @@ async def test_handle_push_sends_push_complete_on_success(tmp_path: Path):
     process.kill.assert_not_called()
 
 
-@pytest.mark.asyncio
-async def test_handle_push_sends_auth_error_on_nonzero_exit(tmp_path: Path):
-    bridge = _create_bridge(tmp_path)
+async def test_handle_push_sends_auth_error_on_nonzero_exit(
+    fake_subprocess: Callable[[SimpleNamespace], None],
+):
+    bridge = _create_bridge()
     bridge._send_event = AsyncMock()
     process = _fake_process(returncode=1)
+    fake_subprocess(process)
 
-    with patch(
-        "src.sandbox.bridge.asyncio.create_subprocess_exec", AsyncMock(return_value=process)
-    ):
-        await bridge._handle_push(_push_command())
+    await bridge._handle_push(_push_command())
 
+    assert process.exec_kwargs["cwd"] == REPO_DIR
     bridge._send_event.assert_awaited_once()
     await_args = bridge._send_event.await_args
     assert await_args is not None
@@ -90,32 +146,23 @@ async def test_handle_push_sends_auth_error_on_nonzero_exit(tmp_path: Path):
     process.kill.assert_not_called()
 
 
-@pytest.mark.asyncio
-async def test_handle_push_timeout_terminates_process_and_sends_error(tmp_path: Path):
-    bridge = _create_bridge(tmp_path)
+async def test_handle_push_timeout_terminates_process_and_sends_error(
+    fake_subprocess: Callable[[SimpleNamespace], None],
+):
+    bridge = _create_bridge()
     bridge._send_event = AsyncMock()
     bridge.GIT_PUSH_TIMEOUT_SECONDS = 42.0
     bridge.GIT_PUSH_TERMINATE_GRACE_SECONDS = 3.0
 
     process = _fake_process(returncode=None)
-    wait_for_calls: list[float | None] = []
-    original_wait_for = asyncio.wait_for
-
-    async def timeout_first_wait_for(coro, timeout=None):
-        wait_for_calls.append(timeout)
-        if len(wait_for_calls) == 1:
-            if hasattr(coro, "close"):
-                coro.close()
-            raise TimeoutError
-        return await original_wait_for(coro, timeout=timeout)
+    fake_subprocess(process)
+    wait_for = _TimeoutFirst()
 
-    with (
-        patch("src.sandbox.bridge.asyncio.create_subprocess_exec", AsyncMock(return_value=process)),
-        patch("src.sandbox.bridge.asyncio.wait_for", side_effect=timeout_first_wait_for),
-    ):
+    with patch("src.sandbox.bridge.asyncio.wait_for", wait_for):
         await bridge._handle_push(_push_command())
 
-    assert wait_for_calls == [42.0, 3.0]
+    assert process.exec_kwargs["cwd"] == REPO_DIR
+    assert wait_for.calls == [42.0, 3.0]
     process.terminate.assert_called_once()
     process.wait.assert_awaited_once()
     process.kill.assert_not_called()
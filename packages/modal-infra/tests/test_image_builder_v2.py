@@ -2,6 +2,8 @@
 
 import json
 import time
+from collections.abc import AsyncIterator
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
@@ -16,17 +18,86 @@ from src.scheduler.image_builder import (
     _stream_build_logs,
 )
 
+# Structured log lines emitted by the build sandbox, serialized once at import.
+_LINE_SUPERVISOR_START = json.dumps({"level": "info", "event": "supervisor.start"})
+_LINE_CLONE_START = json.dumps({"level": "info", "event": "git.clone_start"})
+_LINE_CLONE_ERROR = json.dumps({"level": "error", "event": "git.clone_error"})
+_LINE_SYNC_COMPLETE_ABC123DEF456 = json.dumps(
+    {"level": "info", "event": "git.sync_complete", "head_sha": "abc123def456"}
+)
+_LINE_SYNC_COMPLETE_ABC123 = json.dumps(
+    {"level": "info", "event": "git.sync_complete", "head_sha": "abc123"}
+)
+_LINE_BUILD_COMPLETE_TIMED = json.dumps(
+    {"level": "info", "event": "image_build.complete", "duration_ms": 5000}
+)
+_LINE_BUILD_COMPLETE = json.dumps({"level": "info", "event": "image_build.complete"})
+
+SAMPLE_TOKEN_SECRET = "test-secret"
+
+
+@pytest.fixture(scope="module")
+def sample_token() -> str:
+    """Token for checks that don't depend on when it was issued (format, signature)."""
+    return generate_internal_token(SAMPLE_TOKEN_SECRET)
+
+
+def _fake_httpx_client(post_result: Any) -> AsyncMock:
+    """Build an httpx.AsyncClient stand-in whose post() returns or raises post_result.
+
+    A list is used as a side_effect sequence, an exception is raised, anything
+    else is returned.
+    """
+    client = AsyncMock()
+    if isinstance(post_result, list | BaseException):
+        client.post = AsyncMock(side_effect=post_result)
+    else:
+        client.post = AsyncMock(return_value=post_result)
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=None)
+    return client
+
+
+class _ListAiter:
+    """Async iterator over a list of sandbox stdout lines."""
+
+    def __init__(self, items: list[str]):
+        self._it = iter(items)
+
+    def __aiter__(self) -> "_ListAiter":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class _FakeSandbox:
+    """Sandbox stand-in exposing only the stdout stream _stream_build_logs reads."""
+
+    __slots__ = ("stdout",)
+
+    def __init__(self, stdout: AsyncIterator[str]):
+        self.stdout = stdout
+
+
+@pytest.fixture
+def mock_sleep(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """Replace asyncio.sleep so callback retry backoff returns immediately."""
+    sleep = AsyncMock()
+    monkeypatch.setattr("src.scheduler.image_builder.asyncio.sleep", sleep)
+    return sleep
+
 
 class TestGenerateInternalToken:
     """Test the generate_internal_token function."""
 
-    def test_generates_valid_token(self):
+    def test_generates_valid_token(self, sample_token: str):
         """Generated token should pass verification."""
-        secret = "test-secret-key"
-        token = generate_internal_token(secret)
-
         # Token format: timestamp.signature
-        parts = token.split(".")
+        parts = sample_token.split(".")
         assert len(parts) == 2
 
         timestamp_str, signature = parts
@@ -34,8 +105,8 @@ class TestGenerateInternalToken:
         assert len(signature) == 64  # SHA-256 hex
 
         # Token should verify
-        auth_header = f"Bearer {token}"
-        assert verify_internal_token(auth_header, secret) is True
+        auth_header = f"Bearer {sample_token}"
+        assert verify_internal_token(auth_header, SAMPLE_TOKEN_SECRET) is True
 
     def test_token_rejected_with_wrong_secret(self):
         """Token should fail verification with different secret."""
@@ -54,20 +125,16 @@ class TestGenerateInternalToken:
         assert abs(now_ms - timestamp_ms) < 1000
 
 
+@pytest.mark.usefixtures("mock_sleep")
 class TestCallbackWithRetry:
     """Test the _callback_with_retry function."""
 
-    @pytest.mark.asyncio
     async def test_success_on_first_try(self):
         """Should succeed on first attempt."""
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.raise_for_status = MagicMock()
 
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
+        mock_client = _fake_httpx_client(mock_response)
 
         with patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client):
             result = await _callback_with_retry(
@@ -79,8 +146,7 @@ class TestCallbackWithRetry:
         assert result is True
         mock_client.post.assert_called_once()
 
-    @pytest.mark.asyncio
-    async def test_retries_on_failure(self):
+    async def test_retries_on_failure(self, mock_sleep: AsyncMock):
         """Should retry on failure with backoff."""
         mock_response_fail = MagicMock()
         mock_response_fail.status_code = 500
@@ -94,19 +160,10 @@ class TestCallbackWithRetry:
 
         mock_response_ok = MagicMock()
         mock_response_ok.status_code = 200
-        mock_response_ok.raise_for_status = MagicMock()
-
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(side_effect=[mock_response_fail, mock_response_ok])
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-
-        with (
-            patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client),
-            patch(
-                "src.scheduler.image_builder.asyncio.sleep", new_callable=AsyncMock
-            ) as mock_sleep,
-        ):
+
+        mock_client = _fake_httpx_client([mock_response_fail, mock_response_ok])
+
+        with patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client):
             result = await _callback_with_retry(
                 "https://example.com/callback",
                 {"build_id": "test-123"},
@@ -118,18 +175,11 @@ class TestCallbackWithRetry:
         # Should have slept once with backoff
         mock_sleep.assert_called_once_with(CALLBACK_BACKOFF_BASE**1)
 
-    @pytest.mark.asyncio
     async def test_returns_false_after_all_retries_exhausted(self):
         """Should return False after all retries fail."""
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(side_effect=Exception("connection refused"))
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-
-        with (
-            patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client),
-            patch("src.scheduler.image_builder.asyncio.sleep", new_callable=AsyncMock),
-        ):
+        mock_client = _fake_httpx_client(Exception("connection refused"))
+
+        with patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client):
             result = await _callback_with_retry(
                 "https://example.com/callback",
                 {"build_id": "test-123"},
@@ -139,17 +189,12 @@ class TestCallbackWithRetry:
         assert result is False
         assert mock_client.post.call_count == CALLBACK_MAX_RETRIES
 
-    @pytest.mark.asyncio
     async def test_includes_auth_header(self):
         """Should include Bearer token in auth header."""
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.raise_for_status = MagicMock()
 
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
+        mock_client = _fake_httpx_client(mock_response)
 
         with patch("src.scheduler.image_builder.httpx.AsyncClient", return_value=mock_client):
             await _callback_with_retry(
@@ -172,62 +217,45 @@ class TestCallbackWithRetry:
 class TestStreamBuildLogs:
     """Test the _stream_build_logs function."""
 
-    @staticmethod
-    def _async_stdout(lines):
-        """Create an async iterator from a list of strings."""
-
-        async def _aiter():
-            for line in lines:
-                yield line
-
-        return _aiter()
-
-    @pytest.mark.asyncio
     async def test_returns_sha_and_complete(self):
         """Should return head_sha and build_complete=True on success."""
         log_lines = [
-            json.dumps({"level": "info", "event": "supervisor.start"}),
-            json.dumps({"level": "info", "event": "git.clone_start"}),
-            json.dumps({"level": "info", "event": "git.sync_complete", "head_sha": "abc123def456"}),
-            json.dumps({"level": "info", "event": "image_build.complete", "duration_ms": 5000}),
+            _LINE_SUPERVISOR_START,
+            _LINE_CLONE_START,
+            _LINE_SYNC_COMPLETE_ABC123DEF456,
+            _LINE_BUILD_COMPLETE_TIMED,
         ]
-        mock_sandbox = MagicMock()
-        mock_sandbox.stdout = self._async_stdout(log_lines)
+        sandbox = _FakeSandbox(_ListAiter(log_lines))
 
-        sha, complete = await _stream_build_logs(mock_sandbox)
+        sha, complete = await _stream_build_logs(sandbox)
         assert sha == "abc123def456"
         assert complete is True
 
-    @pytest.mark.asyncio
     async def test_complete_without_sha(self):
         """Should return empty SHA but build_complete=True if sync_complete missing."""
         log_lines = [
-            json.dumps({"level": "info", "event": "supervisor.start"}),
-            json.dumps({"level": "info", "event": "image_build.complete"}),
+            _LINE_SUPERVISOR_START,
+            _LINE_BUILD_COMPLETE,
         ]
-        mock_sandbox = MagicMock()
-        mock_sandbox.stdout = self._async_stdout(log_lines)
+        sandbox = _FakeSandbox(_ListAiter(log_lines))
 
-        sha, complete = await _stream_build_logs(mock_sandbox)
+        sha, complete = await _stream_build_logs(sandbox)
         assert sha == ""
         assert complete is True
 
-    @pytest.mark.asyncio
     async def test_incomplete_when_sandbox_exits(self):
         """Should return build_complete=False if sandbox exits without image_build.complete."""
         log_lines = [
-            json.dumps({"level": "info", "event": "supervisor.start"}),
-            json.dumps({"level": "info", "event": "git.sync_complete", "head_sha": "abc123"}),
-            json.dumps({"level": "error", "event": "git.clone_error"}),
+            _LINE_SUPERVISOR_START,
+            _LINE_SYNC_COMPLETE_ABC123,
+            _LINE_CLONE_ERROR,
         ]
-        mock_sandbox = MagicMock()
-        mock_sandbox.stdout = self._async_stdout(log_lines)
+        sandbox = _FakeSandbox(_ListAiter(log_lines))
 
-        sha, complete = await _stream_build_logs(mock_sandbox)
+        sha, complete = await _stream_build_logs(sandbox)
         assert sha == "abc123"
         assert complete is False
 
-    @pytest.mark.asyncio
     async def test_returns_incomplete_on_error(self):
         """Should return build_complete=False on stream error."""
 
@@ -235,25 +263,22 @@ class TestStreamBuildLogs:
             raise Exception("stream error")
             yield  # noqa: unreachable — makes this an async generator
 
-        mock_sandbox = MagicMock()
-        mock_sandbox.stdout = _raise()
+        sandbox = _FakeSandbox(_raise())
 
-        sha, complete = await _stream_build_logs(mock_sandbox)
+        sha, complete = await _stream_build_logs(sandbox)
         assert sha == ""
         assert complete is False
 
-    @pytest.mark.asyncio
     async def test_handles_malformed_json(self):
         """Should skip malformed JSON lines containing keywords."""
         log_lines = [
             "not json but has git.sync_complete in it",
-            json.dumps({"level": "info", "event": "git.sync_complete", "head_sha": "abc123"}),
-            json.dumps({"level": "info", "event": "image_build.complete"}),
+            _LINE_SYNC_COMPLETE_ABC123,
+            _LINE_BUILD_COMPLETE,
         ]
-        mock_sandbox = MagicMock()
-        mock_sandbox.stdout = self._async_stdout(log_lines)
+        sandbox = _FakeSandbox(_ListAiter(log_lines))
 
-        sha, complete = await _stream_build_logs(mock_sandbox)
+        sha, complete = await _stream_build_logs(sandbox)
         assert sha == "abc123"
         assert complete is True
 
@@ -1,23 +1,22 @@
 """Tests for SandboxSupervisor.monitor_processes bridge restart logic."""
 
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
 
 from src.sandbox.entrypoint import SandboxSupervisor
 
+pytestmark = [
+    # monitor_processes loops until shutdown; with asyncio.sleep stubbed a broken exit
+    # condition never yields to the event loop, so fail fast instead of hanging CI.
+    pytest.mark.timeout(5),
+    pytest.mark.usefixtures("supervisor_env"),
+]
+
 
 def _make_supervisor() -> SandboxSupervisor:
-    """Create a SandboxSupervisor with env vars stubbed out."""
-    with patch.dict(
-        "os.environ",
-        {
-            "SANDBOX_ID": "test-sandbox",
-            "CONTROL_PLANE_URL": "https://cp.example.com",
-            "SANDBOX_AUTH_TOKEN": "tok",
-            "REPO_OWNER": "acme",
-            "REPO_NAME": "app",
-        },
-    ):
-        return SandboxSupervisor()
+    """Create a SandboxSupervisor from the supervisor_env fixture's env vars."""
+    return SandboxSupervisor()
 
 
 def _fake_process(returncode: int | None) -> MagicMock:
@@ -27,6 +26,14 @@ def _fake_process(returncode: int | None) -> MagicMock:
     return proc
 
 
+@pytest.fixture
+def mock_sleep(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """Replace asyncio.sleep so restart backoff and polling return immediately."""
+    sleep = AsyncMock()
+    monkeypatch.setattr("asyncio.sleep", sleep)
+    return sleep
+
+
 class TestBridgeGracefulShutdown:
     """Bridge exit code 0 should propagate shutdown, not restart."""
 
@@ -51,6 +58,7 @@ class TestBridgeGracefulShutdown:
         sup.start_bridge.assert_not_called()
 
 
+@pytest.mark.usefixtures("mock_sleep")
 class TestBridgeCrashRestart:
     """Non-zero bridge exit should restart with backoff up to MAX_RESTARTS."""
 
@@ -72,8 +80,7 @@ class TestBridgeCrashRestart:
         sup.bridge_process = original_process
         sup.start_bridge = AsyncMock(side_effect=restart_side_effect)
 
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            await sup.monitor_processes()
+        await sup.monitor_processes()
 
         sup.start_bridge.assert_called_once()
         sup._report_fatal_error.assert_not_called()
@@ -87,8 +94,7 @@ class TestBridgeCrashRestart:
         sup.bridge_process = _fake_process(returncode=1)
         sup.start_bridge = AsyncMock()  # no-op, bridge_process stays with returncode=1
 
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            await sup.monitor_processes()
+        await sup.monitor_processes()
 
         assert sup.shutdown_event.is_set()
         assert sup.start_bridge.call_count == sup.MAX_RESTARTS
@@ -110,16 +116,16 @@ class TestBridgeCrashRestart:
         sup.bridge_process = original_process
         sup.start_bridge = AsyncMock(side_effect=restart_side_effect)
 
-        with patch("asyncio.sleep", new_callable=AsyncMock):
-            await sup.monitor_processes()
+        await sup.monitor_processes()
 
         sup.start_bridge.assert_called_once()
 
 
+@pytest.mark.usefixtures("mock_sleep")
 class TestBridgeBackoffTiming:
     """Verify exponential backoff delays."""
 
-    async def test_first_restart_uses_base_delay(self):
+    async def test_first_restart_uses_base_delay(self, mock_sleep: AsyncMock):
         sup = _make_supervisor()
         sup.opencode_process = _fake_process(returncode=None)
 
@@ -133,13 +139,12 @@ class TestBridgeBackoffTiming:
         sup.bridge_process = original_process
         sup.start_bridge = AsyncMock(side_effect=restart_side_effect)
 
-        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
-            await sup.monitor_processes()
+        await sup.monitor_processes()
 
         # First restart: delay = BACKOFF_BASE ** 1 = 2.0
         mock_sleep.assert_any_call(sup.BACKOFF_BASE**1)
 
-    async def test_backoff_is_capped_at_max(self):
+    async def test_backoff_is_capped_at_max(self, mock_sleep: AsyncMock):
         sup = _make_supervisor()
         sup.opencode_process = _fake_process(returncode=None)
         sup._report_fatal_error = AsyncMock()
@@ -148,14 +153,8 @@ class TestBridgeBackoffTiming:
         sup.bridge_process = _fake_process(returncode=1)
         sup.start_bridge = AsyncMock()
 
-        sleep_delays = []
-
-        async def capture_sleep(delay):
-            sleep_delays.append(delay)
-
-        with patch("asyncio.sleep", side_effect=capture_sleep):
-            await sup.monitor_processes()
+        await sup.monitor_processes()
 
         # All delays should be <= BACKOFF_MAX
-        for delay in sleep_delays:
+        for delay in (c.args[0] for c in mock_sleep.await_args_list):
             assert delay <= sup.BACKOFF_MAX
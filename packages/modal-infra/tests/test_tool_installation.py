@@ -1,178 +1,206 @@
 """Tests for _install_tools() method in SandboxSupervisor."""
 
-from contextlib import contextmanager
+import errno
+import filecmp
+import json
+import os
+import re
+import shutil
 from pathlib import Path
-from unittest.mock import patch
 
+import pytest
+
+from src.sandbox import entrypoint
 from src.sandbox.entrypoint import SandboxSupervisor
 
 
-def _make_supervisor() -> SandboxSupervisor:
-    """Create a SandboxSupervisor with default test config."""
-    with patch.dict(
-        "os.environ",
-        {
-            "SANDBOX_ID": "test-sandbox",
-            "CONTROL_PLANE_URL": "https://cp.example.com",
-            "SANDBOX_AUTH_TOKEN": "tok",
-            "REPO_OWNER": "acme",
-            "REPO_NAME": "app",
-        },
-    ):
-        return SandboxSupervisor()
+@pytest.fixture(scope="module")
+def supervisor(supervisor_env: None) -> SandboxSupervisor:
+    """SandboxSupervisor shared by the module; _install_tools keeps no per-call state."""
+    return SandboxSupervisor()
 
 
-@contextmanager
-def _patch_paths(legacy: Path | str, tools: Path | str, modules: Path | str = "/nonexistent"):
-    """Patch Path() calls inside _install_tools to redirect to test paths."""
-    with patch("src.sandbox.entrypoint.Path") as MockPath:
-        MockPath.side_effect = lambda p: Path(
-            str(p)
-            .replace("/app/sandbox/inspect-plugin.js", str(legacy))
-            .replace("/app/sandbox/tools", str(tools))
-            .replace("/usr/lib/node_modules", str(modules))
-        )
-        yield
+# Fixture files carry the shared PAYLOAD suffixed with their own name, so the
+# byte-identity checks also catch a source copied to the wrong destination.
+PAYLOAD = b"// "
+TOOL_FILES = ("_bridge-client.js", "spawn-task.js", "get-task-status.js", "cancel-task.js")
 
 
-class TestInstallTools:
-    """Cases for _install_tools() tool installation."""
+def _payload(name: str) -> bytes:
+    return PAYLOAD + name.encode()
 
-    def test_legacy_tool_copied(self, tmp_path):
-        """inspect-plugin.js should be copied as create-pull-request.js."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
 
-        legacy_tool = tmp_path / "app" / "sandbox" / "inspect-plugin.js"
-        legacy_tool.parent.mkdir(parents=True)
-        legacy_tool.write_text("// legacy tool")
+def _mkfile(path: Path, data: bytes) -> None:
+    """Write a small fixture file with raw os calls, skipping the buffered I/O stack."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
 
-        with _patch_paths(legacy=legacy_tool, tools=tmp_path / "no-tools"):
-            sup._install_tools(workdir)
 
-        dest = workdir / ".opencode" / "tool" / "create-pull-request.js"
-        assert dest.exists()
-        assert dest.read_text() == "// legacy tool"
+# os.link errors meaning the filesystem under basetemp does not support hardlinks.
+_NO_HARDLINK_ERRNOS = frozenset({errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP})
 
-    def test_tools_dir_files_copied(self, tmp_path):
-        """All .js files from tools/ directory should be copied."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
-
-        tools_dir = tmp_path / "app" / "sandbox" / "tools"
-        tools_dir.mkdir(parents=True)
-        (tools_dir / "_bridge-client.js").write_text("// bridge client")
-        (tools_dir / "spawn-task.js").write_text("// spawn task")
-        (tools_dir / "get-task-status.js").write_text("// get status")
-        (tools_dir / "cancel-task.js").write_text("// cancel task")
-
-        with _patch_paths(legacy=tmp_path / "no-legacy", tools=tools_dir):
-            sup._install_tools(workdir)
-
-        tool_dest = workdir / ".opencode" / "tool"
-        assert (tool_dest / "_bridge-client.js").exists()
-        assert (tool_dest / "spawn-task.js").exists()
-        assert (tool_dest / "get-task-status.js").exists()
-        assert (tool_dest / "cancel-task.js").exists()
-        assert (tool_dest / "_bridge-client.js").read_text() == "// bridge client"
-
-    def test_non_js_files_skipped(self, tmp_path):
-        """Non-.js files in tools/ directory should not be copied."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
 
-        tools_dir = tmp_path / "app" / "sandbox" / "tools"
-        tools_dir.mkdir(parents=True)
-        (tools_dir / "spawn-task.js").write_text("// tool")
-        (tools_dir / "README.md").write_text("# docs")
-        (tools_dir / "helper.py").write_text("# python")
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink src to dst, copying instead where the filesystem refuses hardlinks."""
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in _NO_HARDLINK_ERRNOS:
+            raise
+        shutil.copyfile(src, dst)
 
-        with _patch_paths(legacy=tmp_path / "no-legacy", tools=tools_dir):
-            sup._install_tools(workdir)
 
-        tool_dest = workdir / ".opencode" / "tool"
-        assert (tool_dest / "spawn-task.js").exists()
-        assert not (tool_dest / "README.md").exists()
-        assert not (tool_dest / "helper.py").exists()
+@pytest.fixture(scope="session")
+def tool_template(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Canonical /app/sandbox tree (legacy plugin plus tools/), built once per session."""
+    root = tmp_path_factory.mktemp("tool-template")
+    _mkfile(root / "inspect-plugin.js", _payload("inspect-plugin.js"))
+    tools_dir = root / "tools"
+    tools_dir.mkdir()
+    for name in TOOL_FILES:
+        _mkfile(tools_dir / name, _payload(name))
+    return root
 
-    def test_graceful_without_tools_dir(self, tmp_path):
-        """Only legacy tool should be copied when tools/ doesn't exist."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
 
-        legacy_tool = tmp_path / "app" / "sandbox" / "inspect-plugin.js"
-        legacy_tool.parent.mkdir(parents=True)
-        legacy_tool.write_text("// legacy")
+@pytest.fixture
+def sandbox_dir(tool_template: Path, tmp_path: Path) -> Path:
+    """Per-test /app/sandbox tree, hardlinked from the session template.
 
-        with _patch_paths(legacy=legacy_tool, tools=tmp_path / "no-tools"):
-            sup._install_tools(workdir)
+    _install_tools only reads these files, so sharing inodes across tests is safe.
+    """
+    dest = tmp_path / "app" / "sandbox"
+    shutil.copytree(tool_template, dest, copy_function=_link_or_copy)
+    return dest
 
-        tool_dest = workdir / ".opencode" / "tool"
-        assert (tool_dest / "create-pull-request.js").exists()
-        js_files = list(tool_dest.glob("*.js"))
-        assert len(js_files) == 1
 
-    def test_no_tools_at_all(self, tmp_path):
-        """Should be a no-op when neither legacy tool nor tools/ exist."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
+# Hardcoded locations _install_tools reads from, matched in one regex scan.
+SANDBOX_LEGACY_TOOL = "/app/sandbox/inspect-plugin.js"
+SANDBOX_TOOLS_DIR = "/app/sandbox/tools"
+GLOBAL_NODE_MODULES = "/usr/lib/node_modules"
+_SANDBOX_PATH_RE = re.compile(
+    "|".join(map(re.escape, (SANDBOX_LEGACY_TOOL, SANDBOX_TOOLS_DIR, GLOBAL_NODE_MODULES)))
+)
 
-        with _patch_paths(legacy=tmp_path / "no-legacy", tools=tmp_path / "no-tools"):
-            sup._install_tools(workdir)
 
-        assert not (workdir / ".opencode").exists()
+class _PatchPaths:
+    """Context manager redirecting the Path() calls inside _install_tools to test paths."""
 
-    def test_node_modules_symlink_created(self, tmp_path):
-        """Node modules symlink and package.json should be created."""
-        sup = _make_supervisor()
-        workdir = tmp_path / "workspace"
-        workdir.mkdir()
+    __slots__ = ("_original", "_table")
 
-        legacy_tool = tmp_path / "app" / "sandbox" / "inspect-plugin.js"
-        legacy_tool.parent.mkdir(parents=True)
-        legacy_tool.write_text("// tool")
+    def __init__(
+        self, legacy: Path | str, tools: Path | str, modules: Path | str = "/nonexistent"
+    ) -> None:
+        self._table = {
+            SANDBOX_LEGACY_TOOL: str(legacy),
+            SANDBOX_TOOLS_DIR: str(tools),
+            GLOBAL_NODE_MODULES: str(modules),
+        }
 
-        global_modules = tmp_path / "global-modules"
-        global_modules.mkdir()
+    def _rewrite(self, p: str) -> Path:
+        return Path(_SANDBOX_PATH_RE.sub(lambda m: self._table[m.group(0)], str(p)))
 
-        with _patch_paths(legacy=legacy_tool, tools=tmp_path / "no-tools", modules=global_modules):
-            sup._install_tools(workdir)
+    def __enter__(self) -> None:
+        self._original = entrypoint.Path
+        entrypoint.Path = self._rewrite
+
+    def __exit__(self, *exc_info: object) -> None:
+        entrypoint.Path = self._original
+
+
+def _entry_names(directory: Path) -> set[str]:
+    """Names in a directory from a single scandir pass, without building Path objects."""
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
 
-        opencode_dir = workdir / ".opencode"
-        node_modules = opencode_dir / "node_modules"
-        assert node_modules.is_symlink()
-        assert node_modules.resolve() == global_modules.resolve()
 
-        package_json = opencode_dir / "package.json"
-        assert package_json.exists()
-        assert '"type": "module"' in package_json.read_text()
+def _no_tools(sandbox_dir: Path, tmp_path: Path) -> Path:
+    return tmp_path / "no-tools"
 
-    def test_legacy_and_tools_dir_combined(self, tmp_path):
-        """Both legacy tool and tools/ directory files should be installed together."""
-        sup = _make_supervisor()
+
+def _template_tools(sandbox_dir: Path, tmp_path: Path) -> Path:
+    return sandbox_dir / "tools"
+
+
+def _mixed_tools(sandbox_dir: Path, tmp_path: Path) -> Path:
+    """tools/ holding one .js tool alongside files that must not be installed."""
+    tools_dir = tmp_path / "mixed-tools"
+    tools_dir.mkdir()
+    _mkfile(tools_dir / "spawn-task.js", _payload("spawn-task.js"))
+    _mkfile(tools_dir / "README.md", _payload("README.md"))
+    _mkfile(tools_dir / "helper.py", _payload("helper.py"))
+    return tools_dir
+
+
+TOOLS_SOURCES = {
+    "none": _no_tools,
+    "template": _template_tools,
+    "mixed": _mixed_tools,
+}
+
+
+class TestInstallTools:
+    """Cases for _install_tools() tool installation."""
+
+    @pytest.mark.parametrize(
+        ("legacy", "tools", "modules", "expected"),
+        [
+            # inspect-plugin.js is installed as create-pull-request.js, even without tools/
+            pytest.param(True, "none", False, {"create-pull-request.js"}, id="legacy_only"),
+            # Every .js file in tools/ is installed, including _-prefixed modules
+            pytest.param(False, "template", False, set(TOOL_FILES), id="tools_dir_only"),
+            # Non-.js files in tools/ are skipped
+            pytest.param(False, "mixed", False, {"spawn-task.js"}, id="non_js_files_skipped"),
+            # Nothing is created when neither the legacy tool nor tools/ exist
+            pytest.param(False, "none", False, None, id="no_tools_at_all"),
+            # Global node_modules is symlinked next to a minimal package.json
+            pytest.param(True, "none", True, {"create-pull-request.js"}, id="node_modules_symlink"),
+            pytest.param(
+                True,
+                "template",
+                False,
+                {"create-pull-request.js", *TOOL_FILES},
+                id="legacy_and_tools_dir_combined",
+            ),
+        ],
+    )
+    def test_install_tools(
+        self, supervisor, sandbox_dir, tmp_path, legacy, tools, modules, expected
+    ):
+        """_install_tools should install exactly the expected tool files."""
         workdir = tmp_path / "workspace"
-        workdir.mkdir()
-
-        legacy_tool = tmp_path / "app" / "sandbox" / "inspect-plugin.js"
-        legacy_tool.parent.mkdir(parents=True)
-        legacy_tool.write_text("// legacy")
-
-        tools_dir = tmp_path / "app" / "sandbox" / "tools"
-        tools_dir.mkdir(parents=True)
-        (tools_dir / "spawn-task.js").write_text("// spawn")
-        (tools_dir / "_bridge-client.js").write_text("// bridge")
-
-        with _patch_paths(legacy=legacy_tool, tools=tools_dir):
-            sup._install_tools(workdir)
-
-        tool_dest = workdir / ".opencode" / "tool"
-        assert (tool_dest / "create-pull-request.js").exists()
-        assert (tool_dest / "spawn-task.js").exists()
-        assert (tool_dest / "_bridge-client.js").exists()
-        js_files = list(tool_dest.glob("*.js"))
-        assert len(js_files) == 3
+        legacy_tool = sandbox_dir / "inspect-plugin.js" if legacy else tmp_path / "no-legacy"
+        tools_dir = TOOLS_SOURCES[tools](sandbox_dir, tmp_path)
+        global_modules = tmp_path / "global-modules"
+        if modules:
+            global_modules.mkdir()
+
+        with _PatchPaths(legacy=legacy_tool, tools=tools_dir, modules=global_modules):
+            supervisor._install_tools(workdir)
+
+        opencode_dir = workdir / ".opencode"
+        if expected is None:
+            assert not opencode_dir.exists()
+            return
+
+        tool_dest = opencode_dir / "tool"
+        assert _entry_names(tool_dest) == expected
+        for name in expected:
+            source = legacy_tool if name == "create-pull-request.js" else tools_dir / name
+            assert filecmp.cmp(source, tool_dest / name, shallow=False)
+
+        # One scandir of .opencode answers every presence check below.
+        with os.scandir(opencode_dir) as entries:
+            opencode_entries = {entry.name: entry for entry in entries}
+
+        if modules:
+            assert opencode_entries["node_modules"].is_symlink()
+            # The link target is stored verbatim, so one readlink suffices; no resolve().
+            assert (opencode_dir / "node_modules").readlink() == global_modules
+        else:
+            assert "node_modules" not in opencode_entries
+
+        assert "package.json" in opencode_entries
+        assert json.loads((opencode_dir / "package.json").read_bytes())["type"] == "module"